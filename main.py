@@ -8,7 +8,10 @@ import discord
 from discord import app_commands, ui
 from discord.ext import tasks
 import os
+import asyncio
+import time
 import mysql.connector
+from collections import deque
 from datetime import datetime, timedelta
 import hashlib
 import secrets
@@ -31,6 +34,11 @@ ROLE_MENTORADO_ID = None
 REGISTRATION_LINK = "https://aluno.operebem.com.br"
 EMBED_COLOR = 0x5865F2
 
+# Configuração da fila de validação
+VALIDATION_WORKERS = int(os.environ.get('VALIDATION_WORKERS', 4))
+VALIDATION_QUEUE_MAX_SIZE = int(os.environ.get('VALIDATION_QUEUE_MAX_SIZE', 500))
+VALIDATION_QUEUE_NOTICE_DEPTH = int(os.environ.get('VALIDATION_QUEUE_NOTICE_DEPTH', 10))
+
 # Validar variáveis de ambiente obrigatórias
 def validate_environment():
     """Validar se todas as variáveis de ambiente necessárias estão configuradas"""
@@ -296,67 +304,161 @@ def mark_role_removed(discord_user_id, bot_user_id=None):
     finally:
         conn.close()
 
-# Modal para validação
-class ValidationModal(ui.Modal, title="Validação de Acesso"):
-    token_input = ui.TextInput(label="Seu Token de Validação", placeholder="Cole aqui o token que você pegou no site...", style=discord.TextStyle.short)
+# Processamento da validação
+async def process_validation(interaction: discord.Interaction, token):
+    """Executar a validação completa e retornar a mensagem de resposta"""
+    try:
+        # Validar código
+        result = await asyncio.to_thread(validate_code, token)
 
-    async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True, thinking=True)
-        token = self.token_input.value.strip()
-        
-        try:
-            # Validar código
-            result = validate_code(token)
-            
-            if not result or not result.get('success'):
-                error_message = result.get('error', 'Token inválido ou já utilizado.') if result else 'Erro interno do servidor'
-                await interaction.followup.send(f"❌ {error_message}", ephemeral=True)
-                return
+        if not result or not result.get('success'):
+            error_message = result.get('error', 'Token inválido ou já utilizado.') if result else 'Erro interno do servidor'
+            return f"❌ {error_message}"
 
-            user_data = result.get('data', {})
-            
-            if user_data.get('is_expired'):
-                await interaction.followup.send("❌ Sua assinatura expirou. Por favor, renove para validar seu acesso.", ephemeral=True)
-                return
+        user_data = result.get('data', {})
 
-            tier = user_data.get('subscription_tier')
-            
-            # Verificar se os cargos estão configurados
-            if not ROLE_ALUNO_ID or not ROLE_MENTORADO_ID:
-                await interaction.followup.send("❌ Erro: Cargos não configurados no bot. Um administrador deve usar `/configurar_cargos` primeiro.", ephemeral=True)
-                return
-            
-            role_id_to_add = ROLE_ALUNO_ID if tier == 'Aluno' else ROLE_MENTORADO_ID
-            role_name = 'Aluno' if tier == 'Aluno' else 'Mentorado'
-            
-            guild = interaction.guild
-            member = interaction.user
-            role_to_add = guild.get_role(role_id_to_add)
+        if user_data.get('is_expired'):
+            return "❌ Sua assinatura expirou. Por favor, renove para validar seu acesso."
 
-            if not role_to_add:
-                await interaction.followup.send(f"❌ Erro: O cargo '{role_name}' não foi encontrado no servidor. Verifique se o cargo existe e se o bot tem permissões.", ephemeral=True)
-                return
-            
-            # Remover outros cargos de assinatura
-            roles_to_remove_ids = [ROLE_ALUNO_ID, ROLE_MENTORADO_ID]
-            roles_to_remove = [role for role in member.roles if role.id in roles_to_remove_ids]
-            if roles_to_remove:
-                await member.remove_roles(*roles_to_remove, reason="Ajuste de plano de assinatura")
+        tier = user_data.get('subscription_tier')
+
+        # Verificar se os cargos estão configurados
+        if not ROLE_ALUNO_ID or not ROLE_MENTORADO_ID:
+            return "❌ Erro: Cargos não configurados no bot. Um administrador deve usar `/configurar_cargos` primeiro."
 
-            # Adicionar cargo
-            await member.add_roles(role_to_add, reason="Validação de assinatura via site")
+        role_id_to_add = ROLE_ALUNO_ID if tier == 'Aluno' else ROLE_MENTORADO_ID
+        role_name = 'Aluno' if tier == 'Aluno' else 'Mentorado'
 
-            # Marcar como validado no banco
-            success = mark_as_validated(token, str(member.id), str(client.user.id))
-            
-            if success:
-                await interaction.followup.send(f"✅ Validação concluída! Você recebeu o cargo **{role_to_add.name}**. Bem-vindo(a)!", ephemeral=True)
-            else:
-                await interaction.followup.send("⚠️ Cargo adicionado, mas houve um erro ao atualizar o banco. Contate um administrador.", ephemeral=True)
+        guild = interaction.guild
+        member = interaction.user
+        role_to_add = guild.get_role(role_id_to_add)
+
+        if not role_to_add:
+            return f"❌ Erro: O cargo '{role_name}' não foi encontrado no servidor. Verifique se o cargo existe e se o bot tem permissões."
+
+        # Remover outros cargos de assinatura
+        roles_to_remove_ids = [ROLE_ALUNO_ID, ROLE_MENTORADO_ID]
+        roles_to_remove = [role for role in member.roles if role.id in roles_to_remove_ids]
+        if roles_to_remove:
+            await member.remove_roles(*roles_to_remove, reason="Ajuste de plano de assinatura")
+
+        # Adicionar cargo
+        await member.add_roles(role_to_add, reason="Validação de assinatura via site")
+
+        # Marcar como validado no banco
+        success = await asyncio.to_thread(mark_as_validated, token, str(member.id), str(client.user.id))
+
+        if success:
+            return f"✅ Validação concluída! Você recebeu o cargo **{role_to_add.name}**. Bem-vindo(a)!"
+        return "⚠️ Cargo adicionado, mas houve um erro ao atualizar o banco. Contate um administrador."
+
+    except Exception as e:
+        print(f"Erro inesperado na validação: {e}")
+        return "❌ Ocorreu um erro inesperado. Contate o suporte."
+
+def _percentile(samples, pct):
+    """Calcular percentil simples de uma lista de amostras"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+# Fila de validação
+class ValidationQueue:
+    """Fila FIFO de validações com número limitado de workers e descarte por profundidade"""
+
+    def __init__(self, workers, max_size, notice_depth):
+        self.workers = workers
+        self.max_size = max_size
+        self.notice_depth = notice_depth
+        self.queue = None
+        self.tasks = []
+        self.pending_users = set()
+        self.in_progress = 0
+        self.processed = 0
+        self.shed = 0
+        self.wait_times = deque(maxlen=500)
+        self.service_times = deque(maxlen=500)
+
+    def start(self):
+        """Iniciar os workers (chamado uma vez no setup do bot)"""
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue()
+        for worker_id in range(self.workers):
+            self.tasks.append(asyncio.create_task(self._worker(worker_id)))
+        print(f"✅ Fila de validação iniciada com {self.workers} workers")
+
+    def depth(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def submit(self, interaction: discord.Interaction, token):
+        """Enfileirar uma validação; a resposta adiada é editada quando o job termina"""
+        user_id = interaction.user.id
 
-        except Exception as e:
-            print(f"Erro inesperado na validação: {e}")
-            await interaction.followup.send("❌ Ocorreu um erro inesperado. Contate o suporte.", ephemeral=True)
+        if user_id in self.pending_users:
+            await interaction.edit_original_response(content="⏳ Sua validação já está na fila. Aguarde o resultado na mensagem anterior.")
+            return
+
+        ahead = self.depth()
+        if ahead >= self.max_size:
+            self.shed += 1
+            print(f"⚠️ Fila de validação cheia ({ahead}), pedido de {interaction.user} descartado")
+            await interaction.edit_original_response(content="⚠️ Muitas validações em andamento no momento. Tente novamente em alguns minutos.")
+            return
+
+        self.pending_users.add(user_id)
+        self.queue.put_nowait((interaction, token, time.monotonic()))
+
+        if ahead >= self.notice_depth:
+            await interaction.edit_original_response(content=f"⏳ Você está na fila de validação, posição **{ahead + 1}**. Esta mensagem será atualizada quando sua validação for concluída.")
+
+    async def _worker(self, worker_id):
+        while True:
+            interaction, token, enqueued_at = await self.queue.get()
+            started_at = time.monotonic()
+            self.wait_times.append(started_at - enqueued_at)
+            self.in_progress += 1
+
+            try:
+                message = await process_validation(interaction, token)
+                await interaction.edit_original_response(content=message)
+            except Exception as e:
+                print(f"Erro no worker de validação {worker_id}: {e}")
+            finally:
+                self.in_progress -= 1
+                self.processed += 1
+                self.service_times.append(time.monotonic() - started_at)
+                self.pending_users.discard(interaction.user.id)
+                self.queue.task_done()
+
+    def metrics(self):
+        """Métricas da fila: profundidade, tempo de espera e tempo de serviço"""
+        wait_times = list(self.wait_times)
+        service_times = list(self.service_times)
+        return {
+            'depth': self.depth(),
+            'in_progress': self.in_progress,
+            'workers': self.workers,
+            'processed': self.processed,
+            'shed': self.shed,
+            'wait_avg': sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            'wait_p95': _percentile(wait_times, 95),
+            'service_avg': sum(service_times) / len(service_times) if service_times else 0.0,
+            'service_p95': _percentile(service_times, 95),
+        }
+
+validation_queue = ValidationQueue(VALIDATION_WORKERS, VALIDATION_QUEUE_MAX_SIZE, VALIDATION_QUEUE_NOTICE_DEPTH)
+
+# Modal para validação
+class ValidationModal(ui.Modal, title="Validação de Acesso"):
+    token_input = ui.TextInput(label="Seu Token de Validação", placeholder="Cole aqui o token que você pegou no site...", style=discord.TextStyle.short)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        token = self.token_input.value.strip()
+        await validation_queue.submit(interaction, token)
 
 # View com botões
 class ValidationView(ui.View):
@@ -381,6 +483,7 @@ class MyClient(discord.Client):
         guild = discord.Object(id=GUILD_ID)
         self.tree.copy_global_to(guild=guild)
         await self.tree.sync(guild=guild)
+        validation_queue.start()
 
 intents = discord.Intents.default()
 intents.members = True
@@ -513,6 +616,13 @@ async def status(interaction: discord.Interaction):
     # Status da verificação automática
     embed.add_field(name="Verificação Automática", value="✅ Ativa" if check_expired_subscriptions.is_running() else "❌ Inativa", inline=True)
     
+    # Métricas da fila de validação
+    metrics = validation_queue.metrics()
+    embed.add_field(name="Fila de Validação", value=f"{metrics['depth']} aguardando / {metrics['in_progress']} em andamento ({metrics['workers']} workers)", inline=False)
+    embed.add_field(name="Processadas / Descartadas", value=f"{metrics['processed']} / {metrics['shed']}", inline=True)
+    embed.add_field(name="Tempo de Espera", value=f"média {metrics['wait_avg']:.1f}s / p95 {metrics['wait_p95']:.1f}s", inline=True)
+    embed.add_field(name="Tempo de Serviço", value=f"média {metrics['service_avg']:.1f}s / p95 {metrics['service_p95']:.1f}s", inline=True)
+    
     await interaction.followup.send(embed=embed)
 
 @client.tree.command(name="configurar_cargos", description="Configura os IDs dos cargos Aluno e Mentorado.")
@@ -649,6 +759,7 @@ if __name__ == "__main__":
     print(f"Banco: {DB_CONFIG['host']}:{DB_CONFIG['port']}")
     print(f"Database: {DB_CONFIG['database']}")
     print(f"User: {DB_CONFIG['user']}")
+    print(f"Fila de validação: {VALIDATION_WORKERS} workers, limite {VALIDATION_QUEUE_MAX_SIZE}, aviso a partir de {VALIDATION_QUEUE_NOTICE_DEPTH}")
     print("=" * 50)
     
     try: